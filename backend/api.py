@@ -73,6 +73,7 @@ async def lifespan(app: FastAPI):
         pipedream_api.initialize(db)
         credentials_api.initialize(db)
         template_api.initialize(db)
+        await ollama_api.initialize(app)
         
         yield
         
@@ -80,6 +81,10 @@ async def lifespan(app: FastAPI):
         logger.info("Cleaning up agent resources")
         await agent_api.cleanup()
         
+        # Clean up Ollama service before Redis, since in-progress pulls record
+        # their final state there
+        await ollama_api.cleanup(app)
+        
         # Clean up Redis connection
         try:
             logger.info("Closing Redis connection")
@@ -237,5 +242,6 @@ if __name__ == "__main__":
         host="0.0.0.0", 
         port=8000,
         workers=workers,
-        loop="asyncio"
+        # "auto" uses uvloop when installed and falls back to asyncio otherwise
+        loop="auto"
     )
\ No newline at end of file
@@ -8,10 +8,14 @@ This module provides REST API endpoints for:
 - Getting model information
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+import hashlib
+import httpx
+from functools import wraps
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, FastAPI, Request
+from fastapi.responses import ORJSONResponse, Response
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
-from services.ollama_service import ollama_service
+from services.ollama_service import OllamaService
 from utils.logger import logger
 from utils.config import config
 
@@ -19,6 +23,48 @@ from utils.config import config
 router = APIRouter(prefix="/ollama", tags=["ollama"])
 
 
+async def initialize(app: FastAPI):
+    """Create the app-scoped Ollama service; called from the application lifespan."""
+    service = OllamaService()
+    await service.startup()
+    app.state.ollama = service
+
+
+async def cleanup(app: FastAPI):
+    """Shut down the app-scoped Ollama service on application shutdown."""
+    service = getattr(app.state, "ollama", None)
+    if service is not None:
+        await service.shutdown()
+
+
+def get_ollama(request: Request) -> OllamaService:
+    """FastAPI dependency returning the app-scoped Ollama service."""
+    return request.app.state.ollama
+
+
+def ollama_guard(detail: str):
+    """Map errors raised by an Ollama endpoint to HTTP responses.
+    
+    HTTPExceptions pass through, httpx errors become 503, and anything else is
+    logged and reported as a 500 with the given detail.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await fn(*args, **kwargs)
+            except HTTPException:
+                raise
+            except httpx.HTTPError as e:
+                logger.warning(f"Ollama server not accessible in {fn.__name__}: {str(e)}")
+                raise HTTPException(status_code=503, detail="Ollama server is not accessible")
+            except Exception as e:
+                logger.error(f"Error in Ollama endpoint {fn.__name__}: {str(e)}")
+                raise HTTPException(status_code=500, detail=detail)
+        return wrapper
+    return decorator
+
+
 class ModelInfo(BaseModel):
     """Model information response."""
     id: str
@@ -47,108 +93,107 @@ class DeleteModelRequest(BaseModel):
 
 
 @router.get("/status", response_model=ServerStatus)
-async def get_server_status():
+@ollama_guard("Failed to check server status")
+async def get_server_status(ollama_service: OllamaService = Depends(get_ollama)):
     """Check if Ollama server is running and accessible."""
-    try:
-        accessible = await ollama_service.check_server_status()
-        return ServerStatus(
-            status="running" if accessible else "unavailable",
-            accessible=accessible,
-            base_url=ollama_service.base_url
-        )
-    except Exception as e:
-        logger.error(f"Error checking Ollama server status: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to check server status")
-
-
-@router.get("/models", response_model=List[ModelInfo])
-async def get_available_models():
-    """Get list of available Ollama models."""
-    try:
-        # First check if server is accessible
-        if not await ollama_service.check_server_status():
-            raise HTTPException(
-                status_code=503, 
-                detail="Ollama server is not accessible. Make sure Ollama is running on your local machine."
-            )
-        
-        models = await ollama_service.get_formatted_models()
-        return models
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error getting available models: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to get available models")
+    accessible = await ollama_service.check_server_status()
+    return ServerStatus(
+        status="running" if accessible else "unavailable",
+        accessible=accessible,
+        base_url=ollama_service.base_url
+    )
+
+
+def _models_etag(models: List[Dict[str, Any]]) -> str:
+    """Build an ETag for a model list from each model's name and digest."""
+    fingerprint = b"".join(f"{m['name']}@{m['digest']};".encode() for m in models)
+    return f'"{hashlib.blake2b(fingerprint, digest_size=8).hexdigest()}"'
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """Check If-None-Match using weak comparison, as RFC 9110 requires for this header."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@router.get("/models", response_model=List[ModelInfo], response_class=ORJSONResponse)
+@ollama_guard("Failed to get available models")
+async def get_available_models(
+    request: Request,
+    response: Response,
+    ollama_service: OllamaService = Depends(get_ollama)
+):
+    """Get list of available Ollama models.
+    
+    Supports conditional requests: a matching If-None-Match returns 304 without a body.
+    """
+    models = await ollama_service.get_formatted_models()
+    etag = _models_etag(models)
+    if _etag_matches(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
+    return models
 
 
 @router.get("/models/{model_name}")
-async def get_model_info(model_name: str):
+@ollama_guard("Failed to get model information")
+async def get_model_info(model_name: str, ollama_service: OllamaService = Depends(get_ollama)):
     """Get detailed information about a specific model."""
-    try:
-        if not await ollama_service.check_server_status():
-            raise HTTPException(
-                status_code=503, 
-                detail="Ollama server is not accessible"
-            )
-        
-        info = await ollama_service.get_model_info(model_name)
-        if info is None:
-            raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found")
-        
-        return info
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error getting model info for {model_name}: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to get model information")
+    # Forward Ollama's JSON body as-is rather than decoding and re-encoding it
+    content = await ollama_service.get_model_info_bytes(model_name)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found")
+    
+    return Response(content=content, media_type="application/json", status_code=200)
+
+
+@router.post("/models/pull", status_code=202)
+@ollama_guard("Failed to pull model")
+async def pull_model(
+    request: PullModelRequest,
+    background_tasks: BackgroundTasks,
+    ollama_service: OllamaService = Depends(get_ollama)
+):
+    """Start pulling a model from Ollama registry in the background."""
+    # The pull itself runs after the response is sent, so probe first to fail fast
+    if not await ollama_service.check_server_status():
+        raise HTTPException(
+            status_code=503, 
+            detail="Ollama server is not accessible"
+        )
+    
+    if await ollama_service.start_pull(request.model_name):
+        background_tasks.add_task(ollama_service.pull_model, request.model_name)
+    return {"status": "accepted", "model": request.model_name}
 
 
-@router.post("/models/pull")
-async def pull_model(request: PullModelRequest):
-    """Pull a model from Ollama registry."""
-    try:
-        if not await ollama_service.check_server_status():
-            raise HTTPException(
-                status_code=503, 
-                detail="Ollama server is not accessible"
-            )
-        
-        success = await ollama_service.pull_model(request.model_name)
-        if success:
-            return {"message": f"Successfully pulled model: {request.model_name}"}
-        else:
-            raise HTTPException(status_code=400, detail=f"Failed to pull model: {request.model_name}")
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error pulling model {request.model_name}: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to pull model")
+@router.get("/models/pull/{model_name:path}")
+@ollama_guard("Failed to get pull status")
+async def get_pull_status(model_name: str, ollama_service: OllamaService = Depends(get_ollama)):
+    """Get the progress of a model pull started via /models/pull."""
+    state = await ollama_service.get_pull_status(model_name)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"No pull found for model '{model_name}'")
+    return {"model": model_name, **state}
 
 
 @router.delete("/models/delete")
-async def delete_model(request: DeleteModelRequest):
+@ollama_guard("Failed to delete model")
+async def delete_model(request: DeleteModelRequest, ollama_service: OllamaService = Depends(get_ollama)):
     """Delete a model from local storage."""
-    try:
-        if not await ollama_service.check_server_status():
-            raise HTTPException(
-                status_code=503, 
-                detail="Ollama server is not accessible"
-            )
-        
-        success = await ollama_service.delete_model(request.model_name)
-        if success:
-            return {"message": f"Successfully deleted model: {request.model_name}"}
-        else:
-            raise HTTPException(status_code=400, detail=f"Failed to delete model: {request.model_name}")
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error deleting model {request.model_name}: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to delete model")
+    success = await ollama_service.delete_model(request.model_name)
+    if success:
+        return {"message": f"Successfully deleted model: {request.model_name}"}
+    else:
+        raise HTTPException(status_code=400, detail=f"Failed to delete model: {request.model_name}")
 
 
 @router.get("/health")
-async def health_check():
+async def health_check(ollama_service: OllamaService = Depends(get_ollama)):
     """Health check endpoint for Ollama service."""
     try:
         accessible = await ollama_service.check_server_status()
@@ -10,136 +10,403 @@ This module provides utilities for:
 
 import httpx
 import asyncio
-from typing import List, Dict, Any, Optional
+import orjson
+import re
+import time
+from functools import lru_cache
+from typing import AsyncGenerator, Awaitable, Callable, List, Dict, Any, Optional
+from services import redis
 from utils.logger import logger
 from utils.config import config
 
 
+# Errors that mean the Ollama server itself is unreachable; these are raised to
+# callers rather than reported as an empty result
+OLLAMA_UNAVAILABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout)
+
+# Pull state lives in Redis so every worker sees the same progress for a model
+PULL_STATE_KEY = "ollama_pull:{model_name}"
+PULL_LOCK_KEY = "ollama_pull_lock:{model_name}"
+PULL_LOCK_TTL = 120  # refreshed by a heartbeat, so a dead worker's claim expires
+PULL_HEARTBEAT_INTERVAL = 30  # seconds between refreshes of the pull lock and state
+PULL_RESULT_TTL = 3600  # how long the outcome of a finished pull stays readable
+PULL_STATE_INTERVAL = 1.0  # minimum seconds between progress writes to Redis
+# Ollama can go quiet for a long time while verifying digests of multi-GB layers,
+# so only give up on a pull after a long stretch without any progress
+PULL_STALL_TIMEOUT = 1800
+
+
+# Display names for known model families, applied in a single regex pass
+_NAME_MAP = {
+    "llama3.2": "Llama 3.2",
+    "llama3.1": "Llama 3.1",
+    "codellama": "Code Llama",
+    "mistral": "Mistral",
+    "gemma": "Gemma",
+    "phi": "Phi",
+    "qwen": "Qwen",
+    "neural-chat": "Neural Chat",
+    "orca-mini": "Orca Mini",
+}
+_NAME_RE = re.compile("|".join(map(re.escape, _NAME_MAP)))
+_SIZE_RE = re.compile(r"(3b|7b|8b|13b|14b|34b|70b|72b)")
+
+
+@lru_cache(maxsize=512)
+def _format_model_name(model_name: str) -> str:
+    """Format model name for display in the UI."""
+    # Remove common suffixes and format nicely
+    name = model_name.replace("-instruct", "").replace("-chat", "")
+    name = _NAME_RE.sub(lambda m: _NAME_MAP[m.group(0)], name)
+    
+    # Add size information if present
+    size = _SIZE_RE.search(model_name)
+    if size:
+        name = f"{name} ({size.group(1).upper()})"
+    
+    return name
+
+
+# Common Ollama tags, formatted once at import so lookups for them skip the regex path
+_COMMON_MODEL_TAGS = (
+    "llama3.2:latest", "llama3.2:1b", "llama3.2:3b",
+    "llama3.1:latest", "llama3.1:8b", "llama3.1:70b",
+    "codellama:latest", "codellama:7b", "codellama:13b", "codellama:34b",
+    "mistral:latest", "mistral:7b",
+    "gemma:latest", "gemma:2b", "gemma:7b",
+    "phi:latest",
+    "qwen:latest", "qwen:7b", "qwen:14b", "qwen:72b",
+    "neural-chat:latest", "neural-chat:7b",
+    "orca-mini:latest", "orca-mini:3b", "orca-mini:7b", "orca-mini:13b",
+)
+_KNOWN_MODEL_NAMES = {tag: _format_model_name.__wrapped__(tag) for tag in _COMMON_MODEL_TAGS}
+
+
 class OllamaService:
     """Service for managing Ollama local models."""
     
     def __init__(self):
         self.base_url = config.OLLAMA_API_BASE or "http://localhost:11434"
-        self.timeout = 10.0  # 10 second timeout for local connections
+        # Short connect timeout so an unreachable server is detected quickly
+        self.timeout = httpx.Timeout(connect=1.0, read=10.0, write=5.0, pool=2.0)
+        self._client: httpx.AsyncClient | None = None
+        self._status_cache: tuple[float, bool] | None = None
+        self._status_ttl = 2.0  # seconds to reuse the last server status probe
+        self._status_inflight: asyncio.Task | None = None
+        # (fingerprint of /api/tags names/digests, formatted model list)
+        self._models_cache: tuple[int, List[Dict[str, Any]]] | None = None
+        self._pull_tasks: dict[str, asyncio.Task] = {}
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+    
+    async def startup(self):
+        """Create the shared HTTP client used for all Ollama requests."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                # All traffic goes to a single host, so size the pool for it and keep
+                # idle connections around long enough to span UI polling intervals
+                limits=httpx.Limits(
+                    max_keepalive_connections=50,
+                    max_connections=100,
+                    keepalive_expiry=60
+                )
+            )
+            logger.info(f"Ollama HTTP client initialized for {self.base_url}")
+    
+    async def shutdown(self):
+        """Cancel in-progress pulls and close the shared HTTP client."""
+        tasks = list(self._pull_tasks.values())
+        for task in tasks:
+            task.cancel()
+        # Let cancelled pulls record their final state and release their locks
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Ollama HTTP client closed")
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared client, creating it lazily if startup was not called."""
+        if self._client is None:
+            await self.startup()
+        return self._client
+    
+    async def _single_flight(self, key: tuple[str, str], fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn once for concurrent callers sharing the same (operation, model) key.
+        
+        The call runs in its own task so cancelling one caller doesn't affect the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+    
+    def _cached_status(self) -> Optional[bool]:
+        """Return the cached server status if it is still fresh."""
+        if self._status_cache is not None:
+            ts, accessible = self._status_cache
+            if time.monotonic() - ts < self._status_ttl:
+                return accessible
+        return None
     
-    async def check_server_status(self) -> bool:
-        """Check if Ollama server is running and accessible."""
+    async def _probe_server(self) -> bool:
+        """Issue a single liveness request against the Ollama server."""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                return response.status_code == 200
+            client = await self._get_client()
+            # /api/version is constant-size, unlike /api/tags which lists every model
+            response = await client.get("/api/version")
+            return response.status_code == 200
         except Exception as e:
             logger.warning(f"Ollama server not accessible: {str(e)}")
             return False
     
+    async def check_server_status(self, force: bool = False) -> bool:
+        """Check if Ollama server is running and accessible.
+        
+        Results are cached for a short TTL; pass force=True to bypass the cache.
+        Concurrent callers share a single in-flight probe.
+        """
+        if not force:
+            cached = self._cached_status()
+            if cached is not None:
+                return cached
+        
+        # The probe runs in its own task so a cancelled caller doesn't cancel it for
+        # everyone else; each caller awaits it through a shield
+        if self._status_inflight is None:
+            self._status_inflight = asyncio.create_task(self._refresh_status())
+            self._status_inflight.add_done_callback(self._clear_status_inflight)
+        return await asyncio.shield(self._status_inflight)
+    
+    async def _refresh_status(self) -> bool:
+        accessible = await self._probe_server()
+        self._status_cache = (time.monotonic(), accessible)
+        return accessible
+    
+    def _clear_status_inflight(self, task: asyncio.Task):
+        if self._status_inflight is task:
+            self._status_inflight = None
+    
     async def get_available_models(self) -> List[Dict[str, Any]]:
         """Get list of available models from Ollama server."""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                if response.status_code == 200:
-                    data = response.json()
-                    models = data.get("models", [])
-                    logger.info(f"Found {len(models)} Ollama models")
-                    return models
-                else:
-                    logger.error(f"Failed to get Ollama models: {response.status_code}")
-                    return []
+            client = await self._get_client()
+            response = await client.get("/api/tags")
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                models = data.get("models", [])
+                logger.info(f"Found {len(models)} Ollama models")
+                return models
+            else:
+                logger.error(f"Failed to get Ollama models: {response.status_code}")
+                return []
+        except OLLAMA_UNAVAILABLE_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Error getting Ollama models: {str(e)}")
             return []
     
     async def get_model_info(self, model_name: str) -> Optional[Dict[str, Any]]:
         """Get detailed information about a specific model."""
+        content = await self.get_model_info_bytes(model_name)
+        return orjson.loads(content) if content is not None else None
+    
+    async def get_model_info_bytes(self, model_name: str) -> Optional[bytes]:
+        """Get the raw JSON body of Ollama's /api/show response for a model.
+        
+        Concurrent requests for the same model share one call to Ollama.
+        """
+        return await self._single_flight(("show", model_name), lambda: self._get_model_info_bytes(model_name))
+    
+    async def _get_model_info_bytes(self, model_name: str) -> Optional[bytes]:
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/show",
-                    json={"name": model_name}
-                )
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.warning(f"Failed to get model info for {model_name}: {response.status_code}")
-                    return None
+            client = await self._get_client()
+            response = await client.post("/api/show", json={"name": model_name})
+            if response.status_code == 200:
+                return response.content
+            else:
+                logger.warning(f"Failed to get model info for {model_name}: {response.status_code}")
+                return None
+        except OLLAMA_UNAVAILABLE_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Error getting model info for {model_name}: {str(e)}")
             return None
     
-    async def pull_model(self, model_name: str) -> bool:
-        """Pull a model from Ollama registry."""
+    async def stream_pull_model(self, model_name: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """Pull a model from Ollama registry, yielding progress updates as they arrive.
+        
+        Each item is one NDJSON object from Ollama's /api/pull stream. Failures are
+        reported as an item with an "error" key.
+        """
+        client = await self._get_client()
+        # No read/write timeout for downloads, which can take several minutes
+        async with client.stream(
+            "POST",
+            "/api/pull",
+            json={"name": model_name, "stream": True},
+            timeout=httpx.Timeout(connect=1.0, read=None, write=None, pool=2.0)
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                yield {"error": f"Ollama returned status {response.status_code}"}
+                return
+            
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                yield orjson.loads(line)
+    
+    async def _save_pull_state(self, model_name: str, pulling: bool, progress: Optional[Dict[str, Any]], ex: int):
+        state = {
+            "pulling": pulling,
+            "progress": progress,
+            "error": progress.get("error") if progress else None
+        }
+        await redis.set(PULL_STATE_KEY.format(model_name=model_name), orjson.dumps(state), ex=ex)
+    
+    async def start_pull(self, model_name: str) -> bool:
+        """Claim a pull of this model across all workers.
+        
+        Returns False if a pull of the model is already running somewhere.
+        """
+        lock_key = PULL_LOCK_KEY.format(model_name=model_name)
+        if not await redis.set(lock_key, "1", nx=True, ex=PULL_LOCK_TTL):
+            return False
+        await self._save_pull_state(model_name, True, {"status": "queued"}, PULL_LOCK_TTL)
+        return True
+    
+    async def get_pull_status(self, model_name: str) -> Optional[Dict[str, Any]]:
+        """Return the shared state of the latest pull of a model, if one is known."""
+        state = await redis.get(PULL_STATE_KEY.format(model_name=model_name))
+        return orjson.loads(state) if state else None
+    
+    async def _pull_heartbeat(self, model_name: str):
+        """Keep a running pull's lock and state alive while Ollama sends no progress."""
+        lock_key = PULL_LOCK_KEY.format(model_name=model_name)
+        state_key = PULL_STATE_KEY.format(model_name=model_name)
+        while True:
+            await asyncio.sleep(PULL_HEARTBEAT_INTERVAL)
+            try:
+                await redis.expire(lock_key, PULL_LOCK_TTL)
+                await redis.expire(state_key, PULL_LOCK_TTL)
+            except Exception as e:
+                logger.warning(f"Failed to refresh pull lock for {model_name}: {str(e)}")
+    
+    async def _pull_model(self, model_name: str) -> bool:
+        lock_key = PULL_LOCK_KEY.format(model_name=model_name)
+        progress = None
+        last_saved = 0.0
+        heartbeat = asyncio.create_task(self._pull_heartbeat(model_name))
         try:
-            async with httpx.AsyncClient(timeout=300.0) as client:  # Longer timeout for downloads
-                response = await client.post(
-                    f"{self.base_url}/api/pull",
-                    json={"name": model_name}
-                )
-                if response.status_code == 200:
-                    logger.info(f"Successfully pulled model: {model_name}")
-                    return True
-                else:
-                    logger.error(f"Failed to pull model {model_name}: {response.status_code}")
-                    return False
+            loop = asyncio.get_running_loop()
+            async with asyncio.timeout(PULL_STALL_TIMEOUT) as watchdog:
+                async for progress in self.stream_pull_model(model_name):
+                    watchdog.reschedule(loop.time() + PULL_STALL_TIMEOUT)
+                    if "error" in progress:
+                        logger.error(f"Failed to pull model {model_name}: {progress['error']}")
+                        return False
+                    now = time.monotonic()
+                    if now - last_saved >= PULL_STATE_INTERVAL:
+                        await self._save_pull_state(model_name, True, progress, PULL_LOCK_TTL)
+                        last_saved = now
+                    logger.debug(f"Pulling model {model_name}: {progress.get('status', '')}")
+            if progress is None or progress.get("status") != "success":
+                logger.error(f"Pull of model {model_name} ended without completing")
+                progress = {"error": "Pull ended before completing"}
+                return False
+            logger.info(f"Successfully pulled model: {model_name}")
+            return True
+        except TimeoutError:
+            logger.error(f"Pull of model {model_name} stalled: no progress for {PULL_STALL_TIMEOUT}s")
+            progress = {"error": "Pull stalled waiting for progress from Ollama"}
+            return False
+        except OLLAMA_UNAVAILABLE_ERRORS as e:
+            logger.error(f"Ollama server not accessible while pulling {model_name}: {str(e)}")
+            progress = {"error": "Ollama server is not accessible"}
+            return False
+        except asyncio.CancelledError:
+            progress = {"error": "Pull was interrupted"}
+            raise
         except Exception as e:
             logger.error(f"Error pulling model {model_name}: {str(e)}")
+            progress = {"error": "Failed to pull model"}
             return False
+        finally:
+            heartbeat.cancel()
+            try:
+                await self._save_pull_state(model_name, False, progress, PULL_RESULT_TTL)
+                await redis.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"Failed to record pull state for {model_name}: {str(e)}")
+    
+    async def pull_model(self, model_name: str) -> bool:
+        """Pull a model from Ollama registry.
+        
+        The pull should first be claimed with start_pull so other workers see it.
+        Concurrent pulls of the same model within this worker share one download.
+        """
+        task = self._pull_tasks.get(model_name)
+        if task is None:
+            task = asyncio.create_task(self._pull_model(model_name))
+            self._pull_tasks[model_name] = task
+            task.add_done_callback(lambda _: self._pull_tasks.pop(model_name, None))
+        return await asyncio.shield(task)
     
     async def delete_model(self, model_name: str) -> bool:
         """Delete a model from local storage."""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.delete(
-                    f"{self.base_url}/api/delete",
-                    json={"name": model_name}
-                )
-                if response.status_code == 200:
-                    logger.info(f"Successfully deleted model: {model_name}")
-                    return True
-                else:
-                    logger.error(f"Failed to delete model {model_name}: {response.status_code}")
-                    return False
+            client = await self._get_client()
+            # httpx only accepts a body on DELETE through the generic request method
+            response = await client.request("DELETE", "/api/delete", json={"name": model_name})
+            if response.status_code == 200:
+                logger.info(f"Successfully deleted model: {model_name}")
+                return True
+            else:
+                logger.error(f"Failed to delete model {model_name}: {response.status_code}")
+                return False
+        except OLLAMA_UNAVAILABLE_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Error deleting model {model_name}: {str(e)}")
             return False
     
     def format_model_name(self, model_name: str) -> str:
         """Format model name for display in the UI."""
-        # Remove common suffixes and format nicely
-        name = model_name.replace("-instruct", "").replace("-chat", "")
-        name = name.replace("llama3.2", "Llama 3.2").replace("llama3.1", "Llama 3.1")
-        name = name.replace("codellama", "Code Llama").replace("mistral", "Mistral")
-        name = name.replace("gemma", "Gemma").replace("phi", "Phi")
-        name = name.replace("qwen", "Qwen").replace("neural-chat", "Neural Chat")
-        name = name.replace("orca-mini", "Orca Mini")
-        
-        # Add size information if present
-        if any(size in model_name for size in ["3b", "7b", "8b", "13b", "14b", "34b", "70b", "72b"]):
-            for size in ["3b", "7b", "8b", "13b", "14b", "34b", "70b", "72b"]:
-                if size in model_name:
-                    name = f"{name} ({size.upper()})"
-                    break
-        
-        return name
+        known = _KNOWN_MODEL_NAMES.get(model_name)
+        if known is not None:
+            return known
+        return _format_model_name(model_name)
     
     async def get_formatted_models(self) -> List[Dict[str, Any]]:
-        """Get available models with formatted names for UI display."""
+        """Get available models with formatted names for UI display.
+        
+        The model list is always fetched from Ollama, so every worker sees pulls and
+        deletes immediately; the formatted list is reused while it is unchanged.
+        """
         models = await self.get_available_models()
-        formatted_models = []
+        fingerprint = hash(tuple((m.get("name", ""), m.get("digest", ""), m.get("modified_at", "")) for m in models))
+        cache = self._models_cache
+        if cache is not None and cache[0] == fingerprint:
+            return cache[1]
         
-        for model in models:
-            model_name = model.get("name", "")
-            formatted_name = self.format_model_name(model_name)
-            formatted_models.append({
-                "id": f"ollama/{model_name}",
-                "name": model_name,
-                "display_name": formatted_name,
+        fmt = self.format_model_name
+        formatted_models = [
+            {
+                "id": f"ollama/{name}",
+                "name": name,
+                "display_name": fmt(name),
                 "size": model.get("size", 0),
                 "modified_at": model.get("modified_at", ""),
                 "digest": model.get("digest", "")
-            })
+            }
+            for model in models
+            for name in (model.get("name", ""),)
+        ]
         
+        self._models_cache = (fingerprint, formatted_models)
         return formatted_models
 
-
-# Global instance
-ollama_service = OllamaService() 
\ No newline at end of file
@@ -66,14 +66,20 @@ export const OllamaModelManager: React.FC<OllamaModelManagerProps> = ({ onModelA
 
   const fetchModels = async () => {
     setLoading(true);
+    // Probe the server and request the model list concurrently; drop the
+    // list request if the probe reports the server as unavailable
+    const modelsController = new AbortController();
+    const modelsRequest = fetch('/api/ollama/models', { signal: modelsController.signal });
+    modelsRequest.catch(() => {});
     try {
       const accessible = await fetchServerStatus();
       if (!accessible) {
+        modelsController.abort();
         setModels([]);
         return;
       }
 
-      const response = await fetch('/api/ollama/models');
+      const response = await modelsRequest;
       if (response.ok) {
         const modelList = await response.json();
         setModels(modelList);
@@ -101,6 +107,41 @@ export const OllamaModelManager: React.FC<OllamaModelManagerProps> = ({ onModelA
       });
 
       if (response.ok) {
+        // The pull runs in the background; poll until it finishes. A missing or
+        // malformed status means the state is unknown, never that the pull succeeded.
+        const maxUnknownPolls = 15;
+        let unknownPolls = 0;
+        let pullStatus = null;
+        while (true) {
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+          let status = null;
+          try {
+            const statusResponse = await fetch(
+              `/api/ollama/models/pull/${encodeURIComponent(modelName)}`,
+            );
+            if (statusResponse.ok) {
+              status = await statusResponse.json();
+            }
+          } catch (error) {
+            console.warn('Failed to fetch pull status:', error);
+          }
+          if (!status || typeof status.pulling !== 'boolean' || !status.progress) {
+            if (++unknownPolls >= maxUnknownPolls) {
+              console.error('Lost track of model pull:', modelName);
+              return;
+            }
+            continue;
+          }
+          unknownPolls = 0;
+          if (!status.pulling) {
+            pullStatus = status;
+            break;
+          }
+        }
+        if (pullStatus.error || pullStatus.progress.status !== 'success') {
+          console.error('Failed to pull model:', pullStatus.error ?? pullStatus.progress);
+          return;
+        }
         // Refresh the model list
         await fetchModels();
         // Notify parent component